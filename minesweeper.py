@@ -1,5 +1,42 @@
+import collections
 import itertools
 import random
+import sys
+
+import numpy as np
+
+try:
+    import numba
+    prange = numba.prange
+except ImportError:
+    numba = None
+    prange = range
+
+
+def _all_nearby(board):
+    """
+    Returns an int8 array holding, for every cell of a boolean
+    mine board, the number of mines among its neighbours.
+    """
+    H, W = board.shape
+    out = np.zeros((H, W), np.int8)
+    for i in prange(H):
+        for j in range(W):
+            c = 0
+            for di in range(-1, 2):
+                ii = i + di
+                if 0 <= ii < H:
+                    for dj in range(-1, 2):
+                        jj = j + dj
+                        if 0 <= jj < W and (di or dj) and board[ii, jj]:
+                            c += 1
+            out[i, j] = c
+    return out
+
+
+# Compile the stencil when Numba is available, otherwise run it as plain Python
+if numba is not None:
+    _all_nearby = numba.njit(cache=True, parallel=True, boundscheck=False)(_all_nearby)
 
 
 class Minesweeper():
@@ -12,23 +49,14 @@ class Minesweeper():
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
-        self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.board = np.zeros((height, width), dtype=np.bool_)
 
         # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        flat_idx = random.sample(range(height * width), mines)
+        self.board.flat[flat_idx] = True
+        self.mines = set(map(tuple, np.argwhere(self.board).tolist()))
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -38,19 +66,15 @@ class Minesweeper():
         Prints a text-based representation
         of where mines are located.
         """
+        border = "--" * self.width + "-"
+        out = [border]
         for i in range(self.height):
-            print("--" * self.width + "-")
-            for j in range(self.width):
-                if self.board[i][j]:
-                    print("|X", end="")
-                else:
-                    print("| ", end="")
-            print("|")
-        print("--" * self.width + "-")
+            out.append("".join("|X" if self.board[i, j] else "| " for j in range(self.width)) + "|")
+            out.append(border)
+        sys.stdout.write("\n".join(out) + "\n")
 
     def is_mine(self, cell):
-        i, j = cell
-        return self.board[i][j]
+        return bool(self.board[cell])
 
     def nearby_mines(self, cell):
         """
@@ -59,23 +83,17 @@ class Minesweeper():
         not including the cell itself.
         """
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
+        # Sum the 3x3 window around the cell, clipped to the board,
+        # then discount the cell itself
+        i, j = cell
+        sub = self.board[max(i - 1, 0):i + 2, max(j - 1, 0):j + 2]
+        return int(sub.sum()) - int(self.board[i, j])
 
-        return count
+    def all_nearby_mines(self):
+        """
+        Returns an array with the nearby_mines count of every cell.
+        """
+        return _all_nearby(self.board)
 
     def won(self):
         """
@@ -84,55 +102,82 @@ class Minesweeper():
         return self.mines_found == self.mines
 
 
+def _iter_cells(mask):
+    """
+    Yields the index of every set bit in a cell bitmask.
+    """
+    while mask:
+        lsb = mask & -mask
+        yield lsb.bit_length() - 1
+        mask ^= lsb
+
+
 class Sentence():
     """
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    The set of cells is stored as an int bitmask, with bit n
+    standing for the cell at flat index n. The mask is immutable,
+    so marking a cell rebinds self.cells instead of mutating it.
     """
 
+    __slots__ = ("cells", "count", "dirty", "dead")
+
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        self.cells = cells
         self.count = count
 
+        # Set whenever cells or count change, until the AI re-checks it
+        self.dirty = True
+
+        # Set once the sentence is dropped from the knowledge base
+        self.dead = False
+
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
+        return self.cells == other.cells
+
+    def __hash__(self):
+        return hash(self.cells)
 
     def __str__(self):
-        return f"{self.cells} = {self.count}"
+        return f"{set(_iter_cells(self.cells))} = {self.count}"
 
     def known_mines(self):
         """
-        Returns the set of all cells in self.cells known to be mines.
+        Returns the bitmask of all cells in self.cells known to be mines.
         """
-        if len(self.cells) == self.count:
-            return set(self.cells)
-        return set()
+        if self.cells.bit_count() == self.count:
+            return self.cells
+        return 0
 
     def known_safes(self):
         """
-        Returns the set of all cells in self.cells known to be safe.
+        Returns the bitmask of all cells in self.cells known to be safe.
         """
         if self.count == 0:
-            return set(self.cells)
-        return set()
-    def mark_mine(self, cell):
+            return self.cells
+        return 0
+
+    def mark_mine(self, bit):
         """
         Updates internal knowledge representation given the fact that
-        a cell is known to be a mine.
+        the cell with the given bit is known to be a mine.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        if self.cells & bit:
+            self.cells &= ~bit
             self.count -= 1
+            self.dirty = True
 
-    def mark_safe(self, cell):
+    def mark_safe(self, bit):
         """
         Updates internal knowledge representation given the fact that
-        a cell is known to be safe.
+        the cell with the given bit is known to be safe.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
-
+        if self.cells & bit:
+            self.cells &= ~bit
+            self.dirty = True
 
 
 class MinesweeperAI():
@@ -146,6 +191,21 @@ class MinesweeperAI():
         self.height = height
         self.width = width
 
+        # Print debugging output as the AI reasons about the board
+        self.verbose = False
+
+        # Cells are tracked internally as flat indices (i * width + j)
+        # and only converted back to (i, j) tuples at the API boundary
+        self._pack = lambda i, j: i * self.width + j
+        self._unpack = lambda idx: divmod(idx, self.width)
+
+        # Flat indices of each cell's neighbours, looked up by flat index
+        self._neighbours = [
+            [self._pack(i + di, j + dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)
+             if (di or dj) and 0 <= i + di < height and 0 <= j + dj < width]
+            for i in range(height) for j in range(width)
+        ]
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -153,8 +213,52 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Cells known to be safe that have not been played yet
+        self.pending_safes = set()
+
+        # Cells that are neither played nor known mines, for random moves
+        self.available = set(range(height * width))
+
+        # Sentences about the game known to be true, keyed by their cells
+        self.knowledge = {}
+
+        # Sentences indexed by the cells they mention, so marking a cell
+        # only touches the sentences that contain it
+        self.cell_to_sentences = collections.defaultdict(list)
+
+    def _add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base and indexes it by cell.
+        Sentences with no cells, or with the same cells as a sentence
+        already known, are dropped.
+        """
+        if not self._file(sentence):
+            return
+        for cell in _iter_cells(sentence.cells):
+            self.cell_to_sentences[cell].append(sentence)
+
+    def _rekey(self, sentence, key):
+        """
+        Moves a sentence whose cells changed away from its old key,
+        dropping it if it is now empty or a duplicate.
+        """
+        del self.knowledge[key]
+        self._file(sentence)
+
+    def _file(self, sentence):
+        """
+        Stores a sentence under its cells and returns True, or marks it
+        dead and returns False if it is empty or already known. Two
+        sentences about the same cells must agree on the mine count.
+        """
+        known = self.knowledge.get(sentence.cells)
+        if known is not None:
+            assert known.count == sentence.count, f"contradiction: {known} vs {sentence}"
+        if not sentence.cells or known is not None:
+            sentence.dead = True
+            return False
+        self.knowledge[sentence.cells] = sentence
+        return True
 
     def mark_mine(self, cell):
         """
@@ -162,8 +266,15 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.available.discard(cell)
+        bit = 1 << cell
+        # Once marked, the cell drops out of every sentence for good,
+        # so its index entry is no longer needed
+        for sentence in self.cell_to_sentences.pop(cell, ()):
+            if not sentence.dead:
+                key = sentence.cells
+                sentence.mark_mine(bit)
+                self._rekey(sentence, key)
 
     def mark_safe(self, cell):
         """
@@ -171,8 +282,53 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        if cell not in self.moves_made:
+            self.pending_safes.add(cell)
+        bit = 1 << cell
+        # Once marked, the cell drops out of every sentence for good,
+        # so its index entry is no longer needed
+        for sentence in self.cell_to_sentences.pop(cell, ()):
+            if not sentence.dead:
+                key = sentence.cells
+                sentence.mark_safe(bit)
+                self._rekey(sentence, key)
+
+    def _queue_known(self, sentence, queue):
+        """
+        Queues the cells a sentence determines as ("safe", cell)
+        or ("mine", cell) pairs, and marks the sentence as checked.
+        """
+        sentence.dirty = False
+        queue.extend(("safe", c) for c in _iter_cells(sentence.known_safes()))
+        queue.extend(("mine", c) for c in _iter_cells(sentence.known_mines()))
+
+    def _subset_pairs(self, sentences):
+        """
+        Yields every (sentence, otherSentence) pair from a list of
+        distinct sentences where otherSentence's cells are a proper
+        subset of sentence's cells.
+        """
+        if self.height * self.width <= 64:
+            # Every mask fits in a uint64, so test all pairs at once:
+            # sub[a, b] is True when the cells of b are a subset of a
+            masks = np.array([s.cells for s in sentences], dtype=np.uint64)
+            sub = (masks[:, None] & masks[None, :]) == masks[None, :]
+            np.fill_diagonal(sub, False)
+            for a, b in zip(*np.nonzero(sub)):
+                yield sentences[a], sentences[b]
+            return
+
+        # Otherwise a subset can only be found among strictly smaller
+        # sentences, so group the sentences by size
+        bySize = collections.defaultdict(list)
+        for s in sentences:
+            bySize[s.cells.bit_count()].append(s)
+        sizes = sorted(bySize)
+        for i, sizeA in enumerate(sizes):
+            for sizeB in sizes[:i]:
+                for sentence, otherSentence in itertools.product(bySize[sizeA], bySize[sizeB]):
+                    if (sentence.cells & otherSentence.cells) == otherSentence.cells:
+                        yield sentence, otherSentence
 
     def add_knowledge(self, cell, count):
         """
@@ -189,58 +345,69 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
+        #Work with the flat index of the cell from here on
+        cell = self._pack(*cell)
+
         #Add the current move to moves made set
         self.moves_made.add(cell)
+        self.pending_safes.discard(cell)
+        self.available.discard(cell)
 
         #We made the move so we can assume it's safe
         self.mark_safe(cell)
 
         #Gets all adjacents cells and makes a sentence
-        adjCells = []
-        for i in range(cell[0]-1,cell[0]+2):
-            for j in range(cell[1]-1, cell[1]+2):
-                if i >= 0 and j >= 0 and i < self.height and j < self.width and not (i,j) in self.safes:
-                    if (i,j) in self.mines:
-                        count -= 1
-                    else:
-                        adjCells.append((i,j))
-        
+        adjMask = 0
+        for neighbour in self._neighbours[cell]:
+            if not neighbour in self.safes:
+                if neighbour in self.mines:
+                    count -= 1
+                else:
+                    adjMask |= 1 << neighbour
+
         #Adds new sentence to knowledge
-        newSentence = Sentence(adjCells,count)
+        newSentence = Sentence(adjMask,count)
         #print(f"Number of unknown bombs touching {cell}: {count}")
         #print(f"List of undetermined cells: {newSentence.cells}")
-        self.knowledge.append(newSentence)
-        #This reevaluates our knowledge
-        for sentence in self.knowledge:
-            safes = sentence.known_safes()
-            for safe in safes:
-                 self.mark_safe(safe)
-            mines = sentence.known_mines()
-            for mine in mines:
-                self.mark_mine(mine)
+        self._add_sentence(newSentence)
+        #This reevaluates our knowledge: queue every cell that a changed sentence determines,
+        #then mark them one at a time, queueing whatever the marks determine in turn
+        queue = collections.deque()
+        for sentence in self.knowledge.values():
+            if sentence.dirty:
+                self._queue_known(sentence, queue)
+        while queue:
+            kind, c = queue.popleft()
+            if c in self.safes or c in self.mines:
+                continue
+            touched = self.cell_to_sentences.get(c, ())#grab before marking drops the index entry
+            if kind == "safe":
+                self.mark_safe(c)
+            else:
+                self.mark_mine(c)
+            for sentence in touched:
+                if sentence.dirty and not sentence.dead:
+                    self._queue_known(sentence, queue)
         #print(f"List of undetermined cells after re: {newSentence.cells}")
-        print(f"List of mines: {self.mines}")
+        if __debug__ and self.verbose:
+            print(f"List of mines: {set(map(self._unpack, self.mines))}")
         #This creates new sentences based on other sentences
         newKnowledge = [] #Contains all the new knowledge sentences we can deduce
-        for sentence in self.knowledge:
-            if sentence.cells == set():#If we find a sentence that is empty
-                self.knowledge.remove(sentence)#remove it from the knowledge base, we have no use for it
-            for otherSentence in self.knowledge:
-                if otherSentence.cells == set():#If we find another sentence that is empty
-                    self.knowledge.remove(otherSentence)#remove it from the knowledge base, we have no use for it
-                if sentence.cells != set() and otherSentence.cells != set() and sentence != otherSentence:#The none of the sentences are empty and they are different
-                    setA = sentence.cells #creates a setA
-                    setB = otherSentence.cells#creates a setB
-                    setAC = sentence.count#keep track of mines in setA
-                    setBC = otherSentence.count#keep track of mines in setB
-                    if len(setA)  > len(setB) and setB <= setA:#if setA has more elements and setB is it's subset
-                        self.knowledge.remove(sentence)#remove setA from the knowledge base because with knowledge acquired it doesn't tell us enough
-                        newKnowledge.append(Sentence(set(setA -setB),setAC - setBC))#take the difference of setA and setB and make a new sentence
-                    elif len(setB)  > len(setA) and setA <= setB:#if setB has more elements and setA is it's subset
-                        self.knowledge.remove(otherSentence)#remove setB from the knowledge base because with knowledge acquired it doesn't tell us enough
-                        newKnowledge.append(Sentence(set(setB - setA),setBC - setAC))#take the difference of setB and setA and make a new sentence
+        #Snapshot the sentences; being keyed by cells, none of them are empty or duplicates
+        snap = list(self.knowledge.values())
+        toRemove = set() #ids of sentences that a subset made redundant
+        for sentence, otherSentence in self._subset_pairs(snap):
+            setA = sentence.cells #creates a setA
+            setB = otherSentence.cells#creates a setB, which is a subset of setA
+            toRemove.add(id(sentence))#setA doesn't tell us enough on its own anymore
+            newKnowledge.append(Sentence(setA & ~setB,sentence.count - otherSentence.count))#take the difference of setA and setB and make a new sentence
+        for s in snap:
+            if id(s) in toRemove:
+                del self.knowledge[s.cells]
+                s.dead = True #stays in cell_to_sentences but is skipped from now on
         #print(f"New knowledege: {newKnowledge}")
-        self.knowledge.extend(newKnowledge)#add all the new knowledge acquired to knowledge base
+        for s in newKnowledge:
+            self._add_sentence(s)#add all the new knowledge acquired to knowledge base
     def make_safe_move(self):
         """
         Returns a safe cell to choose on the Minesweeper board.
@@ -250,11 +417,12 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        for x in self.safes:
-            if not x in self.moves_made:
-                print(f"{x} is a safe move...")
-                return x
-        return None
+        x = next(iter(self.pending_safes), None)
+        if x is None:
+            return None
+        if __debug__ and self.verbose:
+            print(f"{self._unpack(x)} is a safe move...")
+        return self._unpack(x)
 
     def make_random_move(self):
         """
@@ -263,11 +431,6 @@ class MinesweeperAI():
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        randSet = []
-        for i in range(self.height):
-            for j in range(self.width):
-                if not (i,j) in self.mines and not (i,j) in self.moves_made:
-                    randSet.append((i,j))
-        if randSet:
-            return random.choice(randSet)
-        return None
\ No newline at end of file
+        if self.available:
+            return self._unpack(random.choice(tuple(self.available)))
+        return None
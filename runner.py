@@ -184,7 +184,7 @@ while True:
             if move is None:
                 move = ai.make_random_move()
                 if move is None:
-                    flags = ai.mines.copy()
+                    flags = {divmod(cell, WIDTH) for cell in ai.mines}
                     print("No moves left to make.")
                 else:
                     print("No known safe moves, AI making random move.")